@@ -0,0 +1,311 @@
+"""
+Shared AppleScript runner for the macOS senders
+
+Every osascript launch pays for process creation, LaunchServices registration
+and code-signing checks before any AppleScript runs. To pay that once, scripts
+are handed to a single long-lived osascript co-process: a small JavaScript for
+Automation worker that reads one JSON request per line from stdin, runs the
+AppleScript source with NSAppleScript and writes one JSON reply per line to
+stdout.
+
+Scripts are static text that take their parameters through `on run argv`,
+so nothing is ever escaped into the source and each script only has to be
+compiled once: the worker keeps compiled NSAppleScript objects by source, and
+the fallback path compiles each script to a cached .scpt with osacompile.
+
+If the worker can't be started or has died before a request is written,
+the script falls back to a one-off `osascript <compiled.scpt> args...` call.
+A request the worker already received is never re-run, since it may have
+sent its message before the reply was lost.
+"""
+
+import atexit
+import functools
+import hashlib
+import json
+import os
+import queue
+import subprocess
+import threading
+import time
+from typing import Callable, Optional
+
+# Absolute paths plus close_fds=False keep subprocess on its posix_spawn fast
+# path instead of fork+exec, which gets slow with a large parent process
+# (subprocess requires close_fds=False for posix_spawn on every platform).
+# close_fds=False is safe because Python opens fds non-inheritable.
+# Don't add preexec_fn, pass_fds, cwd or start_new_session to these calls:
+# any of them forces the fork+exec path.
+OSASCRIPT = '/usr/bin/osascript'
+OSACOMPILE = '/usr/bin/osacompile'
+
+# Compiled .scpt files for the one-off osascript fallback, named by source hash
+CACHE_DIR = os.path.expanduser('~/Library/Caches/automate-ticketing-srt')
+
+# Requests are written with json.dumps' default ensure_ascii, so a read never
+# splits a multi-byte character and each chunk decodes on its own
+_WORKER_JS = r"""
+ObjC.import('Foundation');
+const input = $.NSFileHandle.fileHandleWithStandardInput;
+const output = $.NSFileHandle.fileHandleWithStandardOutput;
+
+// 'aevt'/'oapp' is the event that invokes a script's run handler; its direct
+// parameter becomes argv
+const kCoreEventClass = 0x61657674;
+const kAEOpenApplication = 0x6f617070;
+const keyDirectObject = 0x2d2d2d2d;
+
+function runEvent(args) {
+    const argv = $.NSAppleEventDescriptor.listDescriptor;
+    args.forEach((arg, i) => argv.insertDescriptorAtIndex($.NSAppleEventDescriptor.descriptorWithString(arg), i + 1));
+    const event = $.NSAppleEventDescriptor.appleEventWithEventClassEventIDTargetDescriptorReturnIDTransactionID(
+        kCoreEventClass, kAEOpenApplication, $.NSAppleEventDescriptor.currentProcessDescriptor, -1, 0);
+    event.setParamDescriptorForKeyword(argv, keyDirectObject);
+    return event;
+}
+
+function errorMessage(error) {
+    return ObjC.unwrap(error[0].objectForKey('NSAppleScriptErrorMessage')) || 'AppleScript error';
+}
+
+function reply(message) {
+    const line = $(JSON.stringify(message) + '\n');
+    output.writeData(line.dataUsingEncoding($.NSUTF8StringEncoding));
+}
+
+const compiled = {};
+let buffer = '';
+while (true) {
+    const data = input.availableData;
+    if (data.length === 0) break;
+    buffer += $.NSString.alloc.initWithDataEncoding(data, $.NSUTF8StringEncoding).js;
+    let newline;
+    while ((newline = buffer.indexOf('\n')) >= 0) {
+        const request = JSON.parse(buffer.slice(0, newline));
+        buffer = buffer.slice(newline + 1);
+        const error = Ref();
+        let script = compiled[request.source];
+        if (!script) {
+            script = $.NSAppleScript.alloc.initWithSource(request.source);
+            if (!script.compileAndReturnError(error)) {
+                reply({ok: false, error: errorMessage(error)});
+                continue;
+            }
+            compiled[request.source] = script;
+        }
+        const result = script.executeAppleEventError(runEvent(request.args), error);
+        if (result.isNil()) {
+            reply({ok: false, error: errorMessage(error)});
+        } else {
+            reply({ok: true, result: ObjC.unwrap(result.stringValue) || ''});
+        }
+    }
+}
+"""
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def _start_worker() -> subprocess.Popen:
+    return subprocess.Popen(
+        [OSASCRIPT, '-l', 'JavaScript', '-e', _WORKER_JS],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        encoding='utf-8',
+        close_fds=False,
+    )
+
+
+def _stop_worker() -> None:
+    """Close the worker's stdin so it exits, killing it if it doesn't"""
+    global _worker
+    with _worker_lock:
+        worker, _worker = _worker, None
+    if worker is None:
+        return
+    try:
+        worker.stdin.close()
+        worker.wait(timeout=2)
+    except Exception:
+        worker.kill()
+
+
+atexit.register(_stop_worker)
+
+
+def _run_in_worker(script: str, args: tuple) -> Optional[dict]:
+    """Send one request to the worker and return its reply, or None if the request never reached it"""
+    global _worker
+    with _worker_lock:
+        try:
+            if _worker is None or _worker.poll() is not None:
+                _worker = _start_worker()
+            _worker.stdin.write(json.dumps({'source': script, 'args': args}) + '\n')
+            _worker.stdin.flush()
+        except OSError:
+            # Popen failed or the pipe is broken: nothing ran, so it's safe to retry elsewhere
+            return None
+        line = _worker.stdout.readline()
+    try:
+        return json.loads(line)
+    except ValueError:
+        # The worker got the request and may already have run it (and sent the
+        # message), so this must not be retried
+        _stop_worker()
+        detail = "exited" if not line else f"sent an invalid reply: {line.strip()[:200]}"
+        raise subprocess.CalledProcessError(1, OSASCRIPT, output='', stderr=f"osascript worker {detail}; the script may have run")
+
+
+_compiled_paths = {}
+
+
+def _compiled_path(script: str) -> Optional[str]:
+    """Path of script compiled to a .scpt in CACHE_DIR, compiling it on first use; None if osacompile fails"""
+    path = _compiled_paths.get(script)
+    if path:
+        return path
+    path = os.path.join(CACHE_DIR, hashlib.sha1(script.encode('utf-8')).hexdigest() + '.scpt')
+    if not os.path.exists(path):
+        # Compile next to the target and rename, so a concurrent run never sees a partial file
+        tmp_path = f"{path[:-5]}.{os.getpid()}.{threading.get_ident()}.scpt"
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            # Only the exit status matters, so don't allocate pipes for the output
+            subprocess.run(
+                [OSACOMPILE, '-o', tmp_path],
+                input=script,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                check=True,
+                close_fds=False
+            )
+            os.replace(tmp_path, path)
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    _compiled_paths[script] = path
+    return path
+
+
+def _run_once(script: str, args: tuple) -> str:
+    path = _compiled_path(script)
+    result = subprocess.run(
+        [OSASCRIPT, path or '-', *args],
+        input=None if path else script,
+        capture_output=True,
+        text=True,
+        check=True,
+        close_fds=False
+    )
+    return result.stdout.rstrip('\n')
+
+
+def run_applescript(script: str, *args: str) -> str:
+    """
+    Run AppleScript source and return its result as text.
+
+    Args:
+        script: The AppleScript source to run; it receives args as `on run argv`
+        *args: Strings passed to the script's run handler
+
+    Returns:
+        str: The script's result, or an empty string if it returns nothing
+
+    Raises:
+        subprocess.CalledProcessError: If the script fails, or the worker dies after
+            receiving it (the error is in .stderr)
+    """
+    reply = _run_in_worker(script, args)
+    if reply is None:
+        _stop_worker()
+        return _run_once(script, args)
+
+    if not reply['ok']:
+        raise subprocess.CalledProcessError(1, OSASCRIPT, output='', stderr=reply['error'])
+    return reply['result']
+
+
+# Popen handles of fire-and-forget scripts, waited on by the reaper thread
+_pending = queue.Queue()
+_reaper = None
+_reaper_lock = threading.Lock()
+
+
+def _reap() -> None:
+    while True:
+        process, description = _pending.get()
+        _, stderr = process.communicate()
+        if process.returncode:
+            print(f"Error in {description}: {stderr.strip()}")
+
+
+def run_applescript_async(script: str, *args: str, description: str = 'AppleScript') -> subprocess.Popen:
+    """
+    Start a script in its own osascript process and return without waiting for it.
+
+    A background thread reaps the process and prints its error if it fails.
+
+    Args:
+        script: The AppleScript source to run; it receives args as `on run argv`
+        *args: Strings passed to the script's run handler
+        description: What the script does, for the error message
+
+    Returns:
+        subprocess.Popen: Handle of the running osascript process
+    """
+    global _reaper
+    path = _compiled_path(script)
+    # osascript stops parsing options at the script file, but after -e it would
+    # take an argument like "-x" as an option, hence the "--"
+    process = subprocess.Popen(
+        [OSASCRIPT, path, *args] if path else [OSASCRIPT, '-e', script, '--', *args],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        close_fds=False
+    )
+    with _reaper_lock:
+        if _reaper is None:
+            _reaper = threading.Thread(target=_reap, name='osascript-reaper', daemon=True)
+            _reaper.start()
+    _pending.put((process, description))
+    return process
+
+
+def app_running(name: str) -> bool:
+    """
+    Check whether an application process with this exact name is running.
+
+    pgrep is a single short exec, unlike an osascript query of System Events.
+    """
+    try:
+        result = subprocess.run(['/usr/bin/pgrep', '-x', name], stdout=subprocess.DEVNULL, close_fds=False)
+        return result.returncode == 0
+    except OSError:
+        return False
+
+
+def cache_for(seconds: float) -> Callable:
+    """
+    Decorator that remembers a no-argument function's result for `seconds`.
+
+    Used for the app-availability checks, which are called before every send
+    but whose answer rarely changes. The wrapper's cache_clear() forgets it.
+    """
+    def decorator(func: Callable) -> Callable:
+        cached = {}
+
+        @functools.wraps(func)
+        def wrapper():
+            now = time.monotonic()
+            if 'value' not in cached or now >= cached['expires']:
+                cached['value'] = func()
+                cached['expires'] = now + seconds
+            return cached['value']
+
+        wrapper.cache_clear = cached.clear
+        return wrapper
+    return decorator
@@ -0,0 +1,190 @@
+"""
+Direct HTTP polling of the SRT schedule search.
+
+Replays the search form the browser already filled in, with the browser's
+cookies, over a single keep-alive connection. Each poll is one HTTP round
+trip instead of a full page render; the browser is only needed again once a
+bookable seat shows up.
+
+Result pages are parsed with selectolax (Lexbor) when it is installed,
+falling back to the stdlib html.parser otherwise.
+"""
+
+import asyncio
+import http.client
+import urllib.parse
+from html.parser import HTMLParser
+from http.cookies import SimpleCookie
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as FastHTMLParser
+except ImportError:
+    FastHTMLParser = None
+
+BOOKING_TEXT = "예약하기"
+
+# Serializes the search form exactly as clicking the submit button would
+SNAPSHOT_FORM_JS = """
+    () => {
+        const dptDt = document.getElementById('dptDt');
+        const form = dptDt ? dptDt.form : null;
+        if (!form) return '';
+        const submitter = form.querySelector("input[type='submit']");
+        return {
+            action: form.action,
+            fields: [...new FormData(form, submitter)],
+            referer: location.href,
+            userAgent: navigator.userAgent,
+        };
+    }
+"""
+
+
+class SearchPoller:
+    """Replays a snapshotted search form over one keep-alive HTTP(S) connection"""
+
+    def __init__(self, snapshot, cookies, timeout=10.0):
+        url = urllib.parse.urlsplit(snapshot['action'])
+        self._connection_class = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+        self._host = url.netloc
+        self._path = url.path + (f"?{url.query}" if url.query else "")
+        self._body = urllib.parse.urlencode(snapshot['fields'])
+        self._headers = {
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'User-Agent': snapshot['userAgent'],
+            'Referer': snapshot['referer'],
+        }
+        self._cookies = {c['name']: c['value'] for c in cookies}
+        self._timeout = timeout
+        self._conn = None
+
+    def _post(self):
+        if self._conn is None:
+            self._conn = self._connection_class(self._host, timeout=self._timeout)
+        headers = dict(self._headers, Cookie='; '.join(f"{k}={v}" for k, v in self._cookies.items()))
+        try:
+            self._conn.request('POST', self._path, body=self._body, headers=headers)
+            response = self._conn.getresponse()
+            data = response.read()
+        except (http.client.HTTPException, OSError):
+            self.close()
+            raise
+
+        # Keep up with session cookie rotation
+        for header in response.headers.get_all('Set-Cookie') or []:
+            cookie = SimpleCookie()
+            cookie.load(header)
+            for name, morsel in cookie.items():
+                self._cookies[name] = morsel.value
+
+        if response.status != 200:
+            raise RuntimeError(f"Direct search returned HTTP {response.status}")
+        charset = response.headers.get_content_charset() or 'utf-8'
+        return data.decode(charset, errors='replace')
+
+    async def search(self):
+        """POST the search form off the event loop and return the response HTML"""
+        return await asyncio.to_thread(self._post)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class _ResultTableParser(HTMLParser):
+    """Collects, per #result-form tbody row, the cell count, arrival time and 예약하기 columns"""
+
+    def __init__(self):
+        super().__init__()
+        self.found_form = False
+        self.rows = []
+        self._in_form = False
+        self._in_tbody = False
+        self._row = None
+        self._link_text = None
+        self._time_text = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'form' and attrs.get('id') == 'result-form':
+            self._in_form = self.found_form = True
+        elif not self._in_form:
+            return
+        elif tag == 'tbody':
+            self._in_tbody = True
+        elif tag == 'tr' and self._in_tbody:
+            self._row = {'cells': 0, 'arrival': None, 'bookable': set()}
+            self.rows.append(self._row)
+        elif tag == 'td' and self._row is not None:
+            self._row['cells'] += 1
+        elif tag == 'a' and self._row is not None:
+            self._link_text = []
+        elif tag == 'em' and self._row is not None and self._row['cells'] == 5 and self._row['arrival'] is None:
+            if 'time' in (attrs.get('class') or '').split():
+                self._time_text = []
+
+    def handle_endtag(self, tag):
+        if tag == 'form':
+            self._in_form = False
+        elif tag == 'tbody':
+            self._in_tbody = False
+            self._row = None
+        elif tag == 'a' and self._link_text is not None:
+            if BOOKING_TEXT in ''.join(self._link_text):
+                self._row['bookable'].add(self._row['cells'])
+            self._link_text = None
+        elif tag == 'em' and self._time_text is not None:
+            self._row['arrival'] = ''.join(self._time_text).strip()
+            self._time_text = None
+
+    def handle_data(self, data):
+        if self._link_text is not None:
+            self._link_text.append(data)
+        if self._time_text is not None:
+            self._time_text.append(data)
+
+
+def _parse_results_fast(html):
+    """selectolax version of _ResultTableParser"""
+    form = FastHTMLParser(html).css_first('#result-form')
+    if form is None:
+        return None
+    rows = []
+    for tr in form.css('tbody tr'):
+        cells = [node for node in tr.iter() if node.tag == 'td']
+        row = {'cells': len(cells), 'arrival': None, 'bookable': set()}
+        if len(cells) >= 5:
+            arrival = cells[4].css_first('em.time')
+            if arrival is not None:
+                row['arrival'] = arrival.text(strip=True)
+        for index, td in enumerate(cells, 1):
+            if any(BOOKING_TEXT in link.text() for link in td.css('a')):
+                row['bookable'].add(index)
+        rows.append(row)
+    return rows
+
+
+def parse_results(html):
+    """Parse the result table rows. Returns None if the page has no result form (e.g. session expired)."""
+    if FastHTMLParser is not None:
+        return _parse_results_fast(html)
+    parser = _ResultTableParser()
+    parser.feed(html)
+    parser.close()
+    return parser.rows if parser.found_form else None
+
+
+def find_bookable(rows, columns, max_arrival=0):
+    """Same selection as the in-page scan: (column, skipped arrivals) for the first bookable row, column 0 if none"""
+    skipped = []
+    for row in rows:
+        hits = [col for col in columns if col in row['bookable']]
+        if not hits or row['cells'] < 9:
+            continue
+        if max_arrival > 0 and row['arrival']:
+            if int(row['arrival'].replace(':', '')) > max_arrival:
+                skipped.append(row['arrival'])
+                continue
+        return hits[0], skipped
+    return 0, skipped
@@ -1,4 +1,6 @@
 import asyncio
+import atexit
+import json
 import random
 import subprocess
 import sys
@@ -7,16 +9,52 @@ load_dotenv()
 from browser_use import Browser
 import os
 import logging
+import logging.handlers
 import platform
-from notification import send_notification
+import queue
+from notification import drain_notifications, send_notification
 from send_email_smtp import send_email_smtp
+from http_search import SNAPSHOT_FORM_JS, SearchPoller, parse_results, find_bookable
 
-# Set up logging (only applies if main.py is run directly, otherwise run_automation.py configures it)
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s  %(levelname)-5s  %(message)s',
-    datefmt='%H:%M:%S',
-)
+_log_listener = None
+
+def _stop_log_listener():
+    """Flush and stop the logging thread, if one is running"""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
+def configure_logging(log_file=None):
+    """Route root logging through a queue so log calls never block the event loop on I/O.
+
+    A QueueListener thread writes the records to the console (and log_file, if given).
+    Calling it again replaces the previous configuration.
+    """
+    global _log_listener
+    _stop_log_listener()
+
+    formatter = logging.Formatter('%(asctime)s  %(levelname)-5s  %(message)s', datefmt='%H:%M:%S')
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    root_logger.handlers.clear()
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    _log_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _log_listener.start()
+
+# Flush whatever is still queued when the process exits
+atexit.register(_stop_log_listener)
+
+# Set up logging (only applies if main.py is run directly, otherwise run_automation.py reconfigures it)
+configure_logging()
 
 # Suppress noisy browser_use debug logs
 for noisy_logger in ['browser_use', 'cdp_use', 'bubus', 'video_recorder', 'BrowserSession']:
@@ -31,25 +69,35 @@ def _quiet_print(*args, **kwargs):
     _original_print(*args, **kwargs)
 builtins.print = _quiet_print
 
+# Platform-specific Chrome locations, resolved once at import
+IS_DARWIN = platform.system() == "Darwin"
+if IS_DARWIN:
+    CHROME_EXEC = '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome'
+    CHROME_USER_DATA = '~/Library/Application Support/Google/Chrome'
+else:
+    CHROME_EXEC = '/opt/google/chrome/google-chrome'
+    CHROME_USER_DATA = '~/.config/google-chrome'
+
 class TicketAutomationError(Exception):
     """Custom exception for ticket automation errors"""
     pass
 
+class UnrecoverableError(TicketAutomationError):
+    """Error that retrying the same operation cannot fix (e.g. a required element is missing)"""
+    pass
+
+# Substrings of transient CDP/browser errors that are worth retrying; anything else fails fast
+RECOVERABLE = ('cdp', 'target', 'layout', 'document', 'timeout', 'disconnected', 'websocket')
+
 
 async def create_browser():
     """Create and start a browser instance with error handling"""
-    if platform.system() == "Darwin":
-        executable_path = '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome'
-        user_data_dir = '~/Library/Application Support/Google/Chrome'
-    else:
-        executable_path = '/opt/google/chrome/google-chrome'
-        user_data_dir = '~/.config/google-chrome'
     try:
         browser = Browser(
-            record_video_dir="./recordings",
+            record_video_dir=os.getenv("RECORD_VIDEO_DIR") or None,
             cdp_url="http://localhost:9222",
-            executable_path=executable_path,
-            user_data_dir=user_data_dir,
+            executable_path=CHROME_EXEC,
+            user_data_dir=CHROME_USER_DATA,
             headless=False,
             highlight_elements=False,
             args=[
@@ -63,68 +111,105 @@ async def create_browser():
         logging.error(f"Failed to create browser: {e}")
         raise TicketAutomationError(f"Browser creation failed: {e}")
 
-async def safe_page_operation(operation, max_retries=3, delay=2):
+async def browser_is_connected(browser, timeout=3.0):
+    """Cheap CDP round trip to check whether the browser connection is still alive"""
+    try:
+        await asyncio.wait_for(browser.cdp_client.send.Browser.getVersion(), timeout=timeout)
+        return True
+    except Exception:
+        return False
+
+async def stop_browser(browser):
+    """Stop the browser session, logging instead of raising on failure"""
+    try:
+        await browser.stop()
+    except Exception as e:
+        logging.warning(f"Error stopping browser: {e}")
+
+def backoff_delay(attempt, base, cap, jitter=0.5):
+    """Exponential backoff with jitter: min(cap, base * 2**attempt) scaled by up to (1 + jitter)"""
+    return min(cap, base * (2 ** attempt)) * (1 + random.random() * jitter)
+
+async def safe_page_operation(operation, max_retries=3, base=0.5, cap=10, jitter=0.5):
     """Safely execute page operations with retry logic"""
     for attempt in range(max_retries):
         try:
             return await operation()
+        except UnrecoverableError:
+            raise
         except Exception as e:
             error_msg = str(e).lower()
-            if any(keyword in error_msg for keyword in ['cdp', 'target', 'layout', 'document']):
-                logging.warning(f"CDP error on attempt {attempt + 1}: {e}")
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(delay * (attempt + 1))  # Exponential backoff
-                    continue
-            raise e
+            if not any(keyword in error_msg for keyword in RECOVERABLE):
+                raise
+            logging.warning(f"CDP error on attempt {attempt + 1}: {e}")
+            if attempt < max_retries - 1:
+                await asyncio.sleep(backoff_delay(attempt, base, cap, jitter))
+                continue
+            raise
     raise TicketAutomationError(f"Operation failed after {max_retries} attempts")
 
-async def main(date, departure_time, number_of_ticket, departure="동대구", arrival="수서", include_first_class=False, max_arrival=None, max_restarts=5):
+async def main(date, departure_time, number_of_ticket, departure="동대구", arrival="수서", include_first_class=False, max_arrival=None, max_restarts=5, poll_mode="browser"):
     """Main function with automatic restart capability"""
     restart_count = 0
+    browser = None
 
-    while restart_count < max_restarts:
-        try:
-            logging.info(f"Starting ticket automation (attempt {restart_count + 1}/{max_restarts})")
-            await run_ticket_search(date, departure_time, number_of_ticket, departure, arrival, include_first_class, max_arrival)
-            break  # Success, exit the retry loop
+    try:
+        while restart_count < max_restarts:
+            try:
+                logging.info(f"Starting ticket automation (attempt {restart_count + 1}/{max_restarts})")
+
+                # Reuse the browser across restarts; only relaunch when its CDP connection is gone
+                if browser is not None and not await browser_is_connected(browser):
+                    logging.warning("Browser connection lost, starting a new browser")
+                    await stop_browser(browser)
+                    browser = None
+                if browser is None:
+                    browser = await create_browser()
+
+                await run_ticket_search(browser, date, departure_time, number_of_ticket, departure, arrival, include_first_class, max_arrival, poll_mode)
+                break  # Success, exit the retry loop
             
-        except TicketAutomationError as e:
-            restart_count += 1
-            logging.error(f"Ticket automation failed (attempt {restart_count}): {e}")
+            except TicketAutomationError as e:
+                restart_count += 1
+                logging.error(f"Ticket automation failed (attempt {restart_count}): {e}")
             
-            if restart_count < max_restarts:
-                wait_time = min(30, 5 * restart_count)  # Progressive backoff, max 30 seconds
-                logging.info(f"Restarting in {wait_time} seconds...")
-                await asyncio.sleep(wait_time)
-            else:
-                logging.error("Maximum restart attempts reached. Exiting.")
-                send_notification(
-                    title="Ticket Automation Failed",
-                    message=f"Failed after {max_restarts} attempts. Check logs.",
-                    sound="Basso"
-                )
-                raise
-        except Exception as e:
-            logging.error(f"Unexpected error: {e}")
-            restart_count += 1
-            if restart_count < max_restarts:
-                await asyncio.sleep(10)
-            else:
-                raise
+                if restart_count < max_restarts:
+                    wait_time = backoff_delay(restart_count - 1, base=5, cap=30)
+                    logging.info(f"Restarting in {wait_time:.1f} seconds...")
+                    await asyncio.sleep(wait_time)
+                else:
+                    logging.error("Maximum restart attempts reached. Exiting.")
+                    send_notification(
+                        title="Ticket Automation Failed",
+                        message=f"Failed after {max_restarts} attempts. Check logs.",
+                        sound="Basso"
+                    )
+                    raise
+            except Exception as e:
+                logging.error(f"Unexpected error: {e}")
+                restart_count += 1
+                if restart_count < max_restarts:
+                    await asyncio.sleep(backoff_delay(restart_count - 1, base=10, cap=30))
+                else:
+                    raise
+    finally:
+        # "Ticket Found!" / "Failed" may still be queued on this loop; let them
+        # go out before asyncio.run tears it down
+        await drain_notifications()
+        if browser:
+            await stop_browser(browser)
 
-async def run_ticket_search(date, departure_time, number_of_ticket, departure, arrival, include_first_class, max_arrival=None):
+async def run_ticket_search(browser, date, departure_time, number_of_ticket, departure, arrival, include_first_class, max_arrival=None, poll_mode="browser"):
     """Core ticket search logic with error handling"""
-    browser = None
+    page = None
     try:
-        browser = await create_browser()
-
         # 1. Actor: Precise navigation and element interactions
         page = await safe_page_operation(
             lambda: browser.new_page("https://etk.srail.kr/hpg/hra/01/selectScheduleList.do?pageId=TK0101010000")
         )
 
-        # Wait a moment for the page to load
-        await asyncio.sleep(3)
+        # Wait for the search form to load
+        await _wait_for_condition(page, _SEARCH_FORM_READY_JS, timeout=3.0)
 
         # Fill departure and destination cities with error handling
         await safe_page_operation(lambda: fill_cities(page, departure, arrival))
@@ -133,57 +218,71 @@ async def run_ticket_search(date, departure_time, number_of_ticket, departure, a
         await safe_page_operation(lambda: fill_form_fields(page, date, departure_time, number_of_ticket))
 
         # Start the continuous ticket checking loop
-        await continuous_ticket_search(page, date, departure_time, number_of_ticket, departure, arrival, include_first_class, max_arrival)
+        if poll_mode == "http":
+            await continuous_http_search(browser, page, date, departure_time, number_of_ticket, departure, arrival, include_first_class, max_arrival)
+        elif poll_mode == "page":
+            await continuous_page_search(page, date, departure_time, number_of_ticket, departure, arrival, include_first_class, max_arrival)
+        else:
+            await continuous_ticket_search(page, date, departure_time, number_of_ticket, departure, arrival, include_first_class, max_arrival)
         
     except Exception as e:
         logging.error(f"Error in ticket search: {e}")
-        raise TicketAutomationError(f"Ticket search failed: {e}")
-    finally:
-        if browser:
+        # Close this attempt's tab before the restart opens a new one; the browser
+        # itself is kept. On success the tab holds the reservation, so it stays open.
+        if page is not None:
             try:
-                await browser.stop()
-            except Exception as e:
-                logging.warning(f"Error stopping browser: {e}")
+                await browser.close_page(page)
+            except Exception as close_error:
+                logging.warning(f"Error closing page: {close_error}")
+        raise TicketAutomationError(f"Ticket search failed: {e}")
 
 async def fill_cities(page, departure, arrival):
     """Fill departure and destination cities"""
+    # One lookup at a time: each starts with DOM.getDocument, which invalidates
+    # the node ids a concurrent lookup is still using
     departure_city = await page.get_elements_by_css_selector("#dptRsStnCdNm")
     destination_city = await page.get_elements_by_css_selector("#arvRsStnCdNm")
 
-    # Check if elements were found
+    # Check if elements were found. The fills stay sequential too: fill() types
+    # into whichever element has focus, so concurrent fills would interleave.
     if departure_city and destination_city:
         await departure_city[0].fill(departure, clear_existing=True)
         await destination_city[0].fill(arrival, clear_existing=True)
     else:
-        raise TicketAutomationError("City elements not found")
+        raise UnrecoverableError("unrecoverable: city elements not found")
 
 async def fill_form_fields(page, date, departure_time, number_of_ticket):
     """Fill all form fields with error handling"""
-    await safe_page_operation(lambda: fill_date_field(page, date))
-    await safe_page_operation(lambda: fill_time_field(page, departure_time))
-    await safe_page_operation(lambda: fill_ticket_count_field(page, number_of_ticket))
-    logging.info(f"Form filled: date={date}, time={departure_time}, tickets={number_of_ticket}")
+    # Independent selects, so their evaluates can be in flight together
+    await asyncio.gather(
+        safe_page_operation(lambda: fill_date_field(page, date)),
+        safe_page_operation(lambda: fill_time_field(page, departure_time)),
+        safe_page_operation(lambda: fill_ticket_count_field(page, number_of_ticket)),
+    )
+    logging.debug("Form filled: date=%s, time=%s, tickets=%s", date, departure_time, number_of_ticket)
+
+# Page scripts are constant and take their inputs as evaluate arguments, so the
+# source never embeds user-supplied values and is identical across iterations.
+# Setting .value on a <select> selects the matching option by itself.
+_SET_VALUE_JS = "(id, v) => { const e = document.getElementById(id); if (e) { e.value = v; return true; } return false; }"
+
+# Serializes DOM-domain lookups that can otherwise overlap under asyncio.gather
+_dom_lookup_lock = asyncio.Lock()
 
 async def _set_select_value(page, element_id, value, label):
     """Set a select dropdown value using JS with select_option fallback"""
     try:
-        await page.evaluate(f"""
-            () => {{
-                const select = document.getElementById('{element_id}');
-                if (!select) return;
-                select.value = '{value}';
-                const options = select.querySelectorAll('option');
-                options.forEach(option => option.removeAttribute('selected'));
-                const target = select.querySelector('option[value="{value}"]');
-                if (target) target.setAttribute('selected', 'selected');
-            }}
-        """)
+        found = await page.evaluate(_SET_VALUE_JS, element_id, value)
+        if found != 'True':
+            logging.warning("%s field #%s not found", label, element_id)
     except Exception as e:
-        logging.warning(f"JS set failed for {label}, trying fallback: {e}")
+        logging.warning("JS set failed for %s, trying fallback: %s", label, e)
         try:
-            el = await page.get_elements_by_css_selector(f"#{element_id}")
-            if el:
-                await el[0].select_option(value)
+            # The selects are filled concurrently, so keep fallback DOM lookups one at a time
+            async with _dom_lookup_lock:
+                el = await page.get_elements_by_css_selector(f"#{element_id}")
+                if el:
+                    await el[0].select_option(value)
         except Exception as e2:
             raise TicketAutomationError(f"{label} selection failed: {e2}")
 
@@ -229,11 +328,12 @@ async def handle_session_expiry(page, date, departure_time, number_of_ticket, de
         await page.evaluate("""
             () => { window.location.href = 'https://etk.srail.kr/cmc/01/selectLoginForm.do?pageId=TK0701000000'; }
         """)
-        await asyncio.sleep(3)
+        await _wait_for_condition(page, "() => !!document.querySelector('.loginSubmit')", timeout=3.0)
         # Fall through to login handling below
 
     # Re-check if we're now on the login page
-    on_login_page = await page.evaluate("() => !!document.querySelector('.loginSubmit')")
+    # browser_use stringifies booleans, so compare against 'True' (a bare 'False' is truthy)
+    on_login_page = await page.evaluate("() => !!document.querySelector('.loginSubmit')") == 'True'
     if page_state == 'login' or on_login_page:
         logging.warning("Session expired — auto-login triggered")
 
@@ -242,13 +342,13 @@ async def handle_session_expiry(page, date, departure_time, number_of_ticket, de
         if login_btn:
             await login_btn[0].click()
             logging.info("Clicked login button, waiting for redirect...")
-            await asyncio.sleep(5)
+            await _wait_for_condition(page, "() => !document.querySelector('.loginSubmit')", timeout=5.0)
 
             # Navigate back to the search page
             await page.evaluate("""
                 () => { window.location.href = 'https://etk.srail.kr/hpg/hra/01/selectScheduleList.do?pageId=TK0101010000'; }
             """)
-            await asyncio.sleep(3)
+            await _wait_for_condition(page, _SEARCH_FORM_READY_JS, timeout=3.0)
 
             # Re-fill the form
             await fill_cities(page, departure, arrival)
@@ -262,76 +362,318 @@ async def handle_session_expiry(page, date, departure_time, number_of_ticket, de
                 message="Auto-login failed. Please log in manually.",
                 sound="Basso"
             )
-            raise TicketAutomationError("Auto-login failed — login button not found")
+            raise UnrecoverableError("unrecoverable: auto-login failed — login button not found")
 
     # Unknown page — try navigating back to search
     logging.warning(f"On unexpected page (state={page_state}), navigating back to search")
     await page.evaluate("""
         () => { window.location.href = 'https://etk.srail.kr/hpg/hra/01/selectScheduleList.do?pageId=TK0101010000'; }
     """)
-    await asyncio.sleep(3)
+    await _wait_for_condition(page, _SEARCH_FORM_READY_JS, timeout=3.0)
     await fill_cities(page, departure, arrival)
     await fill_form_fields(page, date, departure_time, number_of_ticket)
     return True
 
 
-async def continuous_ticket_search(page, date, departure_time, number_of_ticket, departure, arrival, include_first_class, max_arrival=None):
-    """Continuous ticket checking loop with error handling"""
+async def _poll_loop(poll_once, log_every=10):
+    """Call poll_once(attempt) until it returns True, with the shared retry and error accounting"""
     attempt = 1
     consecutive_errors = 0
     max_consecutive_errors = 5
 
     while True:
         try:
-            # Check if we're still on the right page / session is alive
-            re_logged_in = await handle_session_expiry(
-                page, date, departure_time, number_of_ticket, departure, arrival
-            )
-            if re_logged_in:
-                logging.info("Session restored, resuming search")
+            if await poll_once(attempt):
+                return
 
-            # Random delay before clicking search (0.5–1.5s)
-            await asyncio.sleep(random.uniform(0.5, 1.5))
-            await safe_page_operation(lambda: click_search_button(page))
-
-            # Random delay waiting for results (2.5–4s)
-            await asyncio.sleep(random.uniform(2.5, 4.0))
-
-            tickets_found = await safe_page_operation(lambda: check_for_tickets(page, include_first_class, max_arrival))
-
-            if tickets_found:
-                break
-
-            # Random delay before refilling form (0.3–1.0s)
-            await asyncio.sleep(random.uniform(0.3, 1.0))
-            await safe_page_operation(lambda: refill_form_after_search(page, date, departure_time, departure, arrival))
-
-            # Log every 10 attempts to avoid spam
-            if attempt % 10 == 0:
-                logging.info(f"Search attempt #{attempt} — no tickets yet")
+            # Log every few attempts to avoid spam
+            if attempt % log_every == 0:
+                logging.info("Search attempt #%d — no tickets yet", attempt)
 
             attempt += 1
             consecutive_errors = 0
 
         except Exception as e:
             consecutive_errors += 1
-            logging.error(f"Attempt #{attempt} error ({consecutive_errors}/5): {e}")
+            logging.error("Attempt #%d error (%d/%d): %s", attempt, consecutive_errors, max_consecutive_errors, e)
 
             if consecutive_errors >= max_consecutive_errors:
                 raise TicketAutomationError(f"Too many consecutive errors: {consecutive_errors}")
 
-            await asyncio.sleep(5)
+            # Waiting won't fix a missing element; the session check at the start of the next poll will
+            if not isinstance(e, UnrecoverableError):
+                await asyncio.sleep(5)
             attempt += 1
 
+async def continuous_ticket_search(page, date, departure_time, number_of_ticket, departure, arrival, include_first_class, max_arrival=None):
+    """Continuous ticket checking loop with error handling"""
+    async def poll_once(attempt):
+        # Check if we're still on the right page / session is alive
+        re_logged_in = await handle_session_expiry(
+            page, date, departure_time, number_of_ticket, departure, arrival
+        )
+        if re_logged_in:
+            logging.info("Session restored, resuming search")
+
+        # Random delay before clicking search (0.5–1.5s)
+        await asyncio.sleep(random.uniform(0.5, 1.5))
+        await safe_page_operation(lambda: click_search_button(page))
+
+        # Wait for the new result table instead of a fixed delay
+        await wait_for_results(page)
+
+        if await safe_page_operation(lambda: check_for_tickets(page, include_first_class, max_arrival)):
+            return True
+
+        # Random delay before refilling form (0.3–1.0s)
+        await asyncio.sleep(random.uniform(0.3, 1.0))
+        await safe_page_operation(lambda: refill_form_after_search(page, date, departure_time, departure, arrival))
+        return False
+
+    await _poll_loop(poll_once)
+
+async def _start_http_poller(browser, page):
+    """Snapshot the filled search form and the browser's cookies into a SearchPoller"""
+    snapshot = await page.evaluate(SNAPSHOT_FORM_JS)
+    if not snapshot:
+        raise UnrecoverableError("unrecoverable: search form not found for direct search")
+    snapshot = json.loads(snapshot)
+    cookies = await browser.cookies(urls=[snapshot['action']])
+    return SearchPoller(snapshot, cookies)
+
+async def continuous_http_search(browser, page, date, departure_time, number_of_ticket, departure, arrival, include_first_class, max_arrival=None):
+    """Poll the search endpoint over HTTP and only drive the browser once a seat shows up"""
+    columns = [7, 8, 6] if include_first_class else [7, 8]
+    max_arrival_int = int(max_arrival) if max_arrival else 0
+    poller = None
+
+    async def poll_once(attempt):
+        nonlocal poller
+        try:
+            if poller is None:
+                # (Re)sync the session from the browser before polling with it
+                await handle_session_expiry(page, date, departure_time, number_of_ticket, departure, arrival)
+                poller = await _start_http_poller(browser, page)
+
+            # Random delay between searches (0.5–1.5s)
+            await asyncio.sleep(random.uniform(0.5, 1.5))
+            rows = parse_results(await poller.search())
+            if rows is None:
+                raise UnrecoverableError("unrecoverable: direct search response has no result table")
+
+            target_col, skipped = find_bookable(rows, columns, max_arrival_int)
+            if skipped and logging.getLogger().isEnabledFor(logging.DEBUG):
+                logging.debug("Skipped trains arriving at: %s (after %s:%s)", ', '.join(skipped), max_arrival[:2], max_arrival[2:])
+
+            return bool(target_col) and await _book_in_browser(page, target_col, date, departure_time, departure, arrival, include_first_class, max_arrival)
+        except Exception:
+            # Drop the connection; the next poll re-syncs from the browser
+            if poller is not None:
+                poller.close()
+                poller = None
+            raise
+
+    try:
+        await _poll_loop(poll_once)
+    finally:
+        if poller is not None:
+            poller.close()
+
+async def _book_in_browser(page, target_col, date, departure_time, departure, arrival, include_first_class, max_arrival):
+    """Re-run the search in the browser and click the seat a background poll spotted. Returns True if booked."""
+    logging.info("Seat spotted [%s] — booking in the browser", COLUMN_LABELS[target_col])
+    await safe_page_operation(lambda: click_search_button(page))
+    await wait_for_results(page)
+    if await safe_page_operation(lambda: check_for_tickets(page, include_first_class, max_arrival)):
+        return True
+    logging.info("Seat was gone by the time the browser searched, resuming")
+    await safe_page_operation(lambda: refill_form_after_search(page, date, departure_time, departure, arrival))
+    return False
+
+async def continuous_page_search(page, date, departure_time, number_of_ticket, departure, arrival, include_first_class, max_arrival=None):
+    """Run the polling loop inside the page and only come back to Python for bookings and housekeeping"""
+    columns = [7, 8, 6] if include_first_class else [7, 8]
+    max_arrival_int = int(max_arrival) if max_arrival else 0
+
+    async def poll_once(attempt):
+        re_logged_in = await handle_session_expiry(
+            page, date, departure_time, number_of_ticket, departure, arrival
+        )
+        if re_logged_in:
+            logging.info("Session restored, resuming search")
+
+        try:
+            # Budget, plus one last delay and request started just before the deadline
+            result = json.loads(await asyncio.wait_for(
+                page.evaluate(_PAGE_POLL_JS, columns, max_arrival_int, _PAGE_POLL_BUDGET_MS, _PAGE_FETCH_TIMEOUT_MS, 500, 1500),
+                (_PAGE_POLL_BUDGET_MS + _PAGE_FETCH_TIMEOUT_MS) / 1000 + 5,
+            ))
+        except asyncio.TimeoutError:
+            raise TicketAutomationError("timeout: in-page polling evaluate did not return")
+        if result['status'] == 'no_form':
+            raise UnrecoverableError("unrecoverable: search form not found for in-page polling")
+        if result['status'] == 'no_results':
+            raise UnrecoverableError("unrecoverable: in-page search response has no result table")
+        if result['status'] == 'timeout':
+            raise TicketAutomationError(f"timeout: in-page search request took over {_PAGE_FETCH_TIMEOUT_MS} ms")
+
+        if result['status'] == 'found' and await _book_in_browser(page, result['col'], date, departure_time, departure, arrival, include_first_class, max_arrival):
+            return True
+
+        logging.info("Batch #%d ran %d in-page searches", attempt, result['polls'])
+        return False
+
+    # One evaluate covers many searches, so log every batch
+    await _poll_loop(poll_once, log_every=1)
+
 async def click_search_button(page):
     """Click the search button with error handling"""
     search_button = await page.get_elements_by_css_selector("input[type='submit']")
     if search_button:
+        # Mark the current results so wait_for_results can tell them apart from the next ones
+        await page.evaluate(_MARK_RESULTS_STALE_JS)
         # Small random delay before click (0.1–0.4s) to mimic human timing
         await asyncio.sleep(random.uniform(0.1, 0.4))
         await search_button[0].click()
     else:
-        raise TicketAutomationError("Search button not found")
+        raise UnrecoverableError("unrecoverable: search button not found")
+
+_SEARCH_FORM_READY_JS = "() => !!document.getElementById('dptDt')"
+
+_MARK_RESULTS_STALE_JS = """
+    () => {
+        const tbody = document.querySelector('#result-form tbody');
+        if (tbody) tbody.dataset.srtStale = '1';
+    }
+"""
+
+# A result table counts as ready once it has rows and is not the one marked before the click
+_RESULTS_READY_JS = """
+    () => {
+        const tbody = document.querySelector('#result-form tbody');
+        return !!tbody && !tbody.dataset.srtStale && tbody.rows.length > 0;
+    }
+"""
+
+async def _wait_for_condition(page, condition_js, timeout, interval=0.075):
+    """Poll a JS predicate until it holds or the timeout expires. Returns True if it held."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while loop.time() < deadline:
+        try:
+            # browser_use stringifies booleans
+            if await page.evaluate(condition_js) == 'True':
+                return True
+        except Exception:
+            # The document is being replaced mid-navigation; keep polling
+            pass
+        await asyncio.sleep(interval)
+    return False
+
+async def wait_for_results(page, timeout=3.0):
+    """Wait for the search results to render instead of sleeping a fixed amount"""
+    ready = await _wait_for_condition(page, _RESULTS_READY_JS, timeout)
+    if not ready:
+        logging.debug("Results not ready after %ss, checking anyway", timeout)
+    return ready
+
+# Shared by the browser scan and the in-page poll: finds the highest-priority
+# bookable link in `root` (the live document or a fetched one).
+_SCAN_RESULTS_FN = """
+    function scanResults(root, columns, maxArrival) {
+        // Only the candidate booking links are matched, in document (row) order
+        const selector = columns
+            .map(col => `#result-form tbody tr > td:nth-child(${col}) a`)
+            .join(', ');
+        const skipped = [];
+        let best = null;
+
+        for (const link of root.querySelectorAll(selector)) {
+            if (!link.textContent || !link.textContent.includes('예약하기')) continue;
+            const td = link.closest('td');
+            const row = td.parentElement;
+            // An earlier row already has a hit; later rows cannot beat it
+            if (best && best.row !== row) break;
+            if (row.cells.length < 9) continue;
+
+            // Extract arrival time from td[5] (0-indexed: cells[4])
+            if (maxArrival > 0) {
+                const arrivalEl = row.cells[4].querySelector('em.time');
+                if (arrivalEl) {
+                    const arrivalTime = parseInt(arrivalEl.textContent.replace(':', ''), 10);
+                    if (arrivalTime > maxArrival) {
+                        const label = arrivalEl.textContent.trim();
+                        if (skipped[skipped.length - 1] !== label) skipped.push(label);
+                        continue;
+                    }
+                }
+            }
+
+            // Within a row, columns are in priority order
+            const col = td.cellIndex + 1;
+            const priority = columns.indexOf(col);
+            if (!best || priority < best.priority) best = {row, col, link, priority};
+        }
+        return {best: best, skipped: skipped};
+    }
+"""
+
+_CHECK_TICKETS_JS = """
+    (columns, maxArrival) => {
+""" + _SCAN_RESULTS_FN + """
+        const {best, skipped} = scanResults(document, columns, maxArrival);
+        if (best) {
+            best.link.click();
+            return {clicked: best.col, skipped: skipped};
+        }
+        return {clicked: 0, skipped: skipped};
+    }
+"""
+
+COLUMN_LABELS = {6: "특실", 7: "일반실", 8: "예약대기"}
+
+# How long one in-page polling evaluate runs before handing back to Python
+_PAGE_POLL_BUDGET_MS = 30000
+# Per-request limit for the in-page fetch; neither CDP nor browser_use bounds an evaluate
+_PAGE_FETCH_TIMEOUT_MS = 10000
+
+# Re-submits the filled search form with fetch() and scans each response with
+# DOMParser, all inside the page; resolves as soon as a seat shows up, the
+# session looks lost, a request times out, or the time budget runs out.
+# (browser_use only accepts scripts starting with "(", hence the wrapped async IIFE.)
+_PAGE_POLL_JS = """
+    (columns, maxArrival, budgetMs, fetchTimeoutMs, minDelayMs, maxDelayMs) => (async () => {
+""" + _SCAN_RESULTS_FN + """
+        const dptDt = document.getElementById('dptDt');
+        const form = dptDt ? dptDt.form : null;
+        if (!form) return {status: 'no_form', polls: 0};
+        const submitter = form.querySelector("input[type='submit']");
+        const body = new URLSearchParams(new FormData(form, submitter));
+        const deadline = Date.now() + budgetMs;
+        let polls = 0;
+
+        while (Date.now() < deadline) {
+            await new Promise(r => setTimeout(r, minDelayMs + Math.random() * (maxDelayMs - minDelayMs)));
+            let html;
+            try {
+                const response = await fetch(form.action, {
+                    method: 'POST', body: body, credentials: 'same-origin',
+                    signal: AbortSignal.timeout(fetchTimeoutMs),
+                });
+                html = await response.text();
+            } catch (e) {
+                if (e.name === 'TimeoutError') return {status: 'timeout', polls: polls};
+                throw e;
+            }
+            polls++;
+            const doc = new DOMParser().parseFromString(html, 'text/html');
+            if (!doc.getElementById('result-form')) return {status: 'no_results', polls: polls};
+            const {best} = scanResults(doc, columns, maxArrival);
+            if (best) return {status: 'found', col: best.col, polls: polls};
+        }
+        return {status: 'idle', polls: polls};
+    })()
+"""
 
 async def check_for_tickets(page, include_first_class=False, max_arrival=None):
     """Check for available tickets and handle ticket booking.
@@ -343,100 +685,35 @@ async def check_for_tickets(page, include_first_class=False, max_arrival=None):
 
     If max_arrival is set (e.g. "1200"), skips rows where arrival time > max_arrival.
     Arrival time is in td[5] as <em class="time">HH:MM</em>.
-    """
-    columns_js = "[7, 8"
-    if include_first_class:
-        columns_js += ", 6"
-    columns_js += "]"
 
+    The table is scanned and the first match clicked in a single evaluate.
+    """
+    columns = [7, 8, 6] if include_first_class else [7, 8]
     max_arrival_int = int(max_arrival) if max_arrival else 0
-    column_labels = {6: "특실", 7: "일반실", 8: "예약대기"}
 
     try:
-        result = await page.evaluate(f"""
-            () => {{
-                const columns = {columns_js};
-                const maxArrival = {max_arrival_int};
-                const rows = document.querySelectorAll('#result-form tbody tr');
-                const available = [];
-                const skipped = [];
-
-                for (const row of rows) {{
-                    const tds = row.querySelectorAll('td');
-                    if (tds.length < 9) continue;
-
-                    // Extract arrival time from td[5] (0-indexed: tds[4])
-                    if (maxArrival > 0) {{
-                        const arrivalEl = tds[4] ? tds[4].querySelector('em.time') : null;
-                        if (arrivalEl) {{
-                            const arrivalTime = parseInt(arrivalEl.textContent.replace(':', ''), 10);
-                            if (arrivalTime > maxArrival) {{
-                                skipped.push(arrivalEl.textContent.trim());
-                                continue;
-                            }}
-                        }}
-                    }}
-
-                    // Check columns in priority order for this row
-                    for (const col of columns) {{
-                        const td = tds[col - 1];
-                        if (!td) continue;
-                        const link = td.querySelector('a');
-                        if (link && link.textContent && link.textContent.includes('예약하기')) {{
-                            available.push({{col: col, rowIndex: row.rowIndex}});
-                        }}
-                    }}
-                }}
-                return {{available: available, skipped: skipped}};
-            }}
-        """)
+        result = await page.evaluate(_CHECK_TICKETS_JS, columns, max_arrival_int)
 
-        import json
         try:
-            if isinstance(result, str):
-                result = json.loads(result)
+            # browser_use hands objects back JSON-encoded
+            result = json.loads(result)
 
             skipped = result.get('skipped', [])
-            if skipped:
-                logging.debug(f"Skipped trains arriving at: {', '.join(skipped)} (after {max_arrival[:2]}:{max_arrival[2:]})")
-
-            available = result.get('available', [])
-            if len(available) > 0:
-                # Click the first match (already in priority order: 일반실 > 예약대기 > 특실)
-                target = available[0]
-                target_row = target['rowIndex']
-                target_col = target['col']
-
-                click_result = await page.evaluate(f"""
-                    () => {{
-                        const rows = document.querySelectorAll('#result-form tbody tr');
-                        for (const row of rows) {{
-                            if (row.rowIndex === {target_row}) {{
-                                const tds = row.querySelectorAll('td');
-                                const td = tds[{target_col} - 1];
-                                if (td) {{
-                                    const link = td.querySelector('a');
-                                    if (link) {{ link.click(); return true; }}
-                                }}
-                            }}
-                        }}
-                        return false;
-                    }}
-                """)
-
-                if isinstance(click_result, str):
-                    click_result = json.loads(click_result)
-
-                if click_result:
-                    col_label = column_labels.get(target_col, 'unknown')
-                    logging.info(f"🎉 TICKET FOUND! Clicked [{col_label}]")
-                    await handle_ticket_found()
-                    return True
+            if skipped and logging.getLogger().isEnabledFor(logging.DEBUG):
+                logging.debug("Skipped trains arriving at: %s (after %s:%s)", ', '.join(skipped), max_arrival[:2], max_arrival[2:])
+
+            # Highest-priority hit: 일반실 > 예약대기 > 특실
+            target_col = result.get('clicked', 0)
+            if target_col:
+                col_label = COLUMN_LABELS.get(target_col, 'unknown')
+                logging.info(f"🎉 TICKET FOUND! Clicked [{col_label}]")
+                await handle_ticket_found()
+                return True
         except Exception as parse_error:
-            logging.error(f"Error parsing results: {parse_error}")
+            logging.error("Error parsing results: %s", parse_error)
 
     except Exception as e:
-        logging.error(f"Ticket check failed: {e}")
+        logging.error("Ticket check failed: %s", e)
 
     return False
 
@@ -452,13 +729,14 @@ async def handle_ticket_found():
             message="Hello from ticketing automation, buy within 10 minutes",
         )
         # Fallback to AppleScript on macOS
-        if not email_success and platform.system() == "Darwin":
+        if not email_success and IS_DARWIN:
             try:
                 from send_email import send_email
                 email_success = send_email(
                     to_email=recipient,
                     subject="Ticket Found (SRT) - Buy within 10 minutes",
                     message="Hello from ticketing automation, buy within 10 minutes",
+                    prefer_smtp=False,
                 )
             except Exception:
                 pass
@@ -490,35 +768,46 @@ async def handle_ticket_found():
     except Exception as e:
         logging.error(f"✗ Failed to send Telegram notification: {e}")
 
-async def refill_form_after_search(page, date, departure_time, departure, arrival):
-    """Re-fill the form after search results"""
-    # Quick check: are we still on the search page?
-    on_search_page = await page.evaluate("() => document.getElementById('dptRsStnCdNm') !== null")
-    if not on_search_page:
-        logging.warning("Not on search page during refill — session may have expired")
-        raise TicketAutomationError("Not on search page during refill")
-
-    # Re-fill departure and destination cities
-    departure_city = await page.get_elements_by_css_selector("#dptRsStnCdNm")
-    destination_city = await page.get_elements_by_css_selector("#arvRsStnCdNm")
+# Compares every (id, value) pair against the live form in one round trip and only
+# writes the fields that drifted. Returns {missing: [...], changed: [...]}.
+_REFILL_FORM_JS = """
+    (fields) => {
+        const missing = [];
+        const changed = [];
+        for (const [id, value] of fields) {
+            const el = document.getElementById(id);
+            if (!el) { missing.push(id); continue; }
+            if (el.value === value) continue;
+            el.value = value;
+            el.dispatchEvent(new Event('change', {bubbles: true}));
+            changed.push(id);
+        }
+        return {missing: missing, changed: changed};
+    }
+"""
 
-    if departure_city and destination_city:
-        await departure_city[0].fill(departure, clear_existing=True)
-        await destination_city[0].fill(arrival, clear_existing=True)
-    # Re-select date and departure_time after refresh
+async def refill_form_after_search(page, date, departure_time, departure, arrival):
+    """Re-fill only the form fields that no longer hold the requested values"""
+    fields = [
+        ['dptDt', date],
+        ['dptTm', departure_time],
+        ['dptRsStnCdNm', departure],
+        ['arvRsStnCdNm', arrival],
+    ]
     try:
-        await page.evaluate(f"""
-            () => {{
-                const dptDt = document.getElementById('dptDt');
-                const dptTm = document.getElementById('dptTm');
-                if (dptDt) dptDt.value = '{date}';
-                if (dptTm) dptTm.value = '{departure_time}';
-            }}
-        """)
+        result = json.loads(await page.evaluate(_REFILL_FORM_JS, fields))
     except Exception as e:
-        logging.error(f"Form refill failed: {e}")
+        logging.error("Form refill failed: %s", e)
         raise TicketAutomationError("Form refill failed")
 
+    # Any missing field means we are no longer on the search page
+    if result['missing']:
+        logging.warning("Not on search page during refill (missing: %s) — session may have expired", result['missing'])
+        raise UnrecoverableError("unrecoverable: not on search page during refill")
+
+    if result['changed']:
+        logging.debug("Re-filled drifted fields: %s", result['changed'])
+
 if __name__ == "__main__":
     asyncio.run(main(date="20251003", departure_time="200000", number_of_ticket="2", departure="동대구", arrival="수서"))
     # asyncio.run(handle_ticket_found())
@@ -5,19 +5,32 @@ Cross-platform desktop notification.
 - Linux/Windows: uses desktop-notifier (pip package, already in dependencies)
 """
 
+import asyncio
 import subprocess
 import platform
 import logging
 
+IS_DARWIN = platform.system() == "Darwin"
+
+# Strong references to in-flight notification tasks so they aren't garbage collected
+_pending_notifications = set()
+
 
 def send_notification(title, message, sound="default", subtitle="", action_button="", url=""):
-    """Send a desktop notification. Works on macOS, Linux, and Windows."""
-    system = platform.system()
+    """Send a desktop notification. Works on macOS, Linux, and Windows.
+
+    Returns the asyncio task when the notification was scheduled on a running
+    event loop (see drain_notifications), otherwise None.
+    """
+    if IS_DARWIN:
+        return _send_macos(title, message, sound, subtitle, action_button, url)
+    return _send_cross_platform(title, message)
 
-    if system == "Darwin":
-        _send_macos(title, message, sound, subtitle, action_button, url)
-    else:
-        _send_cross_platform(title, message)
+
+async def drain_notifications(timeout=5.0):
+    """Wait for notifications scheduled on the running loop, so they go out before it shuts down."""
+    if _pending_notifications:
+        await asyncio.wait(list(_pending_notifications), timeout=timeout)
 
 
 def _send_macos(title, message, sound, subtitle, action_button, url):
@@ -30,11 +43,12 @@ def _send_macos(title, message, sound, subtitle, action_button, url):
             cmd.extend(['-actions', action_button])
         if url:
             cmd.extend(['-open', url])
-        subprocess.run(cmd, check=True, capture_output=True)
+        # Fire-and-forget: terminal-notifier takes a while to load Cocoa and we don't need its exit status
+        subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
         logging.info(f"Desktop notification sent: {title}")
     except FileNotFoundError:
         logging.warning("terminal-notifier not found, falling back to cross-platform")
-        _send_cross_platform(title, message)
+        return _send_cross_platform(title, message)
     except Exception as e:
         logging.error(f"macOS notification failed: {e}")
 
@@ -43,18 +57,31 @@ def _send_cross_platform(title, message):
     """Cross-platform notification via desktop-notifier."""
     try:
         from desktop_notifier import DesktopNotifier
-        import asyncio
+    except ImportError:
+        logging.warning("desktop-notifier not installed — skipping desktop notification")
+        return
 
-        async def _notify():
+    async def _notify():
+        try:
             notifier = DesktopNotifier()
             await notifier.send(title=title, message=message)
+            logging.info(f"Desktop notification sent: {title}")
+        except Exception as e:
+            logging.error(f"Desktop notification failed: {e}")
 
-        asyncio.get_event_loop().run_until_complete(_notify())
-        logging.info(f"Desktop notification sent: {title}")
-    except ImportError:
-        logging.warning("desktop-notifier not installed — skipping desktop notification")
-    except Exception as e:
-        logging.error(f"Desktop notification failed: {e}")
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        asyncio.run(_notify())
+        return
+
+    # Called from inside the automation's event loop, where run_until_complete
+    # would raise: schedule it so the notification goes out right away without
+    # blocking the caller.
+    task = loop.create_task(_notify())
+    _pending_notifications.add(task)
+    task.add_done_callback(_pending_notifications.discard)
+    return task
 
 
 if __name__ == "__main__":
@@ -0,0 +1,92 @@
+"""
+Streaming reader for the --recipients JSON files used by send_email.py and send_imessage.py
+
+The file is read in chunks and each array item is decoded with
+json.JSONDecoder.raw_decode as soon as it is complete. Sending can start before
+the whole file is parsed, and memory use does not grow with the file size.
+"""
+
+import json
+from typing import Any, Iterator, TextIO
+
+_WHITESPACE = ' \t\r\n'
+
+
+def iter_recipients(f: TextIO, chunk_size: int = 64 * 1024) -> Iterator[Any]:
+    """
+    Yield the items of the JSON array in an open file, one at a time.
+
+    Args:
+        f: Text file containing a JSON array
+        chunk_size: Number of characters to read at a time
+
+    Raises:
+        ValueError: If the file does not contain a JSON array
+        json.JSONDecodeError: If the JSON is invalid or has data after the array (raised
+            when the bad item or the extra data is reached)
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = '', 0, False
+
+    def read_more():
+        nonlocal buffer, pos, eof
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buffer, pos = buffer[pos:] + chunk, 0
+
+    def next_char():
+        """Skip whitespace and return the next character, or '' at the end of the file"""
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if eof:
+                return ''
+            read_more()
+
+    def close_array():
+        """Step past the closing ']' and check that only whitespace follows it"""
+        nonlocal pos
+        pos += 1
+        if next_char():
+            raise json.JSONDecodeError("Extra data", buffer, pos)
+
+    if next_char() != '[':
+        raise ValueError("Recipients file must contain a JSON array")
+    pos += 1
+    if next_char() == ']':
+        close_array()
+        return
+
+    while True:
+        next_char()
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                read_more()
+                continue
+            # A number can decode as a prefix of itself ("1500." -> 1500) when the
+            # chunk ends inside it, so only accept the item once the separator
+            # after it is in the buffer
+            after = end
+            while after < len(buffer) and buffer[after] in _WHITESPACE:
+                after += 1
+            if not eof and (after == len(buffer) or buffer[after] not in ',]'):
+                read_more()
+                continue
+            break
+        yield item
+        pos = end
+
+        separator = next_char()
+        if separator == ']':
+            close_array()
+            return
+        if separator != ',':
+            raise json.JSONDecodeError("Expecting ',' delimiter", buffer, pos)
+        pos += 1
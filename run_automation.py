@@ -3,25 +3,16 @@
 Enhanced Ticket Automation Runner
 
 This script runs the ticket automation with improved error handling and automatic retry.
-It will automatically restart the browser and retry operations when CDP errors occur.
+It will automatically restart the search in a new tab and retry operations when CDP errors occur.
 """
 
 import argparse
 import asyncio
 import logging
-from main import main
+from main import main, configure_logging
 
 # Configure logging (force override any existing config from imported libraries)
-root_logger = logging.getLogger()
-root_logger.setLevel(logging.INFO)
-root_logger.handlers.clear()
-formatter = logging.Formatter('%(asctime)s  %(levelname)-5s  %(message)s', datefmt='%H:%M:%S')
-file_handler = logging.FileHandler('ticket_automation.log')
-file_handler.setFormatter(formatter)
-stream_handler = logging.StreamHandler()
-stream_handler.setFormatter(formatter)
-root_logger.addHandler(file_handler)
-root_logger.addHandler(stream_handler)
+configure_logging('ticket_automation.log')
 
 async def run_automation(args):
     """Run the ticket automation with enhanced error handling"""
@@ -40,6 +31,7 @@ async def run_automation(args):
             include_first_class=args.first_class,
             max_arrival=args.max_arrival,
             max_restarts=args.max_restarts,
+            poll_mode=args.poll_mode,
         )
 
         logging.info("Ticket automation completed successfully!")
@@ -61,7 +53,10 @@ if __name__ == "__main__":
     parser.add_argument("--tickets", default="2", help="Number of tickets (default: 2)")
     parser.add_argument("--first-class", action="store_true", help="Also check 특실 (first class) seats")
     parser.add_argument("--max-arrival", default=None, help="Max arrival time in HHMM format, e.g. 1200 (default: no limit)")
-    parser.add_argument("--max-restarts", type=int, default=5, help="Max browser restarts (default: 5)")
+    parser.add_argument("--max-restarts", type=int, default=5, help="Max search restarts, each in a new tab (default: 5)")
+    parser.add_argument("--poll-mode", choices=["browser", "http", "page"], default="browser",
+                        help="How to poll for seats: click through the browser, replay the search over HTTP, "
+                             "or loop inside the page with fetch(); the browser always does the booking (default: browser)")
     args = parser.parse_args()
 
     seat_types = "일반실 + 예약대기"
@@ -74,6 +69,8 @@ if __name__ == "__main__":
     if args.max_arrival:
         print(f"  Max arrival: {args.max_arrival[:2]}:{args.max_arrival[2:]}")
     print(f"  Seat types: {seat_types}")
+    if args.poll_mode != "browser":
+        print(f"  Polling: {args.poll_mode} (browser used only to book)")
     print("\nPress Ctrl+C to stop the automation\n")
 
     try:
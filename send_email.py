@@ -2,65 +2,99 @@
 """
 Email Sender using AppleScript
 
-This script allows you to send emails using AppleScript on macOS.
+This script allows you to send emails using AppleScript on macOS, or over SMTP
+when SMTP_EMAIL and SMTP_PASSWORD are set (see send_email_smtp.py).
 It provides both a simple function interface and a command-line interface.
 """
 
 import subprocess
 import sys
 import argparse
+import itertools
 import json
-from typing import Optional, List
+from multiprocessing.pool import ThreadPool
+from typing import Iterable, Optional
 
+from applescript import app_running, cache_for, run_applescript, run_applescript_async
+from recipients import iter_recipients
+from send_email_smtp import send_email_smtp, send_email_smtp_bulk, smtp_configured
 
-def send_email(to_email: str, subject: str, message: str, from_email: Optional[str] = None) -> bool:
+# Large SMTP sends are split into batches of SMTP_BATCH_SIZE recipients, one
+# connection per batch, with up to SMTP_CONNECTIONS batches in flight at once
+SMTP_BATCH_SIZE = 50
+SMTP_CONNECTIONS = 4
+
+
+# argv is recipient, subject, content and sender ("" for the default account)
+SEND_EMAIL_SCRIPT = '''
+on run argv
+    set {toAddress, theSubject, theContent, fromAddress} to argv
+    tell application "Mail"
+        set newMessage to make new outgoing message with properties {subject:theSubject, content:theContent}
+        tell newMessage
+            if fromAddress is not "" then set sender to fromAddress
+            make new to recipient at end of to recipients with properties {address:toAddress}
+        end tell
+        send newMessage
+    end tell
+end run
+'''
+
+# argv is subject, content, sender, then the recipient addresses. Returns one
+# "ok" or "error: ..." line per recipient, in order.
+SEND_EMAIL_TO_MULTIPLE_SCRIPT = '''
+on run argv
+    set {theSubject, theContent, fromAddress} to items 1 thru 3 of argv
+    set outcomes to {}
+    tell application "Mail"
+        repeat with toAddress in items 4 thru -1 of argv
+            try
+                set newMessage to make new outgoing message with properties {subject:theSubject, content:theContent}
+                tell newMessage
+                    if fromAddress is not "" then set sender to fromAddress
+                    make new to recipient at end of to recipients with properties {address:(contents of toAddress)}
+                end tell
+                send newMessage
+                set end of outcomes to "ok"
+            on error errMsg
+                -- One line per recipient, so flatten the message onto a single line
+                set AppleScript's text item delimiters to {linefeed, return}
+                set msgLines to text items of errMsg
+                set AppleScript's text item delimiters to " "
+                set end of outcomes to "error: " & (msgLines as text)
+            end try
+        end repeat
+    end tell
+    set AppleScript's text item delimiters to linefeed
+    return outcomes as text
+end run
+'''
+
+
+def send_email(to_email: str, subject: str, message: str, from_email: Optional[str] = None, prefer_smtp: bool = True) -> bool:
     """
-    Send an email using AppleScript.
+    Send an email, over SMTP when it is configured and through Mail via AppleScript otherwise.
     
     Args:
         to_email: The recipient's email address
         subject: The email subject
         message: The email body content
-        from_email: Optional sender email address (uses default if not provided)
+        from_email: Optional sender email address (uses default if not provided).
+            SMTP always sends as SMTP_EMAIL, so giving one forces the AppleScript path.
+        prefer_smtp: Try SMTP first when SMTP_EMAIL and SMTP_PASSWORD are set
         
     Returns:
         bool: True if email was sent successfully, False otherwise
     """
-    # Escape special characters in the message and subject for AppleScript
-    escaped_subject = subject.replace('"', '\\"').replace('\\', '\\\\')
-    escaped_message = message.replace('"', '\\"').replace('\\', '\\\\')
-    
-    # Create the AppleScript command
-    if from_email:
-        applescript = f'''
-        tell application "Mail"
-            set newMessage to make new outgoing message with properties {{subject:"{escaped_subject}", content:"{escaped_message}"}}
-            tell newMessage
-                set sender to "{from_email}"
-                make new to recipient at end of to recipients with properties {{address:"{to_email}"}}
-            end tell
-            send newMessage
-        end tell
-        '''
-    else:
-        applescript = f'''
-        tell application "Mail"
-            set newMessage to make new outgoing message with properties {{subject:"{escaped_subject}", content:"{escaped_message}"}}
-            tell newMessage
-                make new to recipient at end of to recipients with properties {{address:"{to_email}"}}
-            end tell
-            send newMessage
-        end tell
-        '''
+    if prefer_smtp and not from_email and smtp_configured():
+        if send_email_smtp(to_email, subject, message):
+            print(f"Email sent successfully to {to_email}")
+            return True
+        print("SMTP failed, falling back to Mail")
     
     try:
         # Execute the AppleScript
-        subprocess.run(
-            ['osascript', '-e', applescript],
-            capture_output=True,
-            text=True,
-            check=True
-        )
+        run_applescript(SEND_EMAIL_SCRIPT, to_email, subject, message, from_email or "")
         print(f"Email sent successfully to {to_email}")
         return True
         
@@ -73,61 +107,125 @@ def send_email(to_email: str, subject: str, message: str, from_email: Optional[s
         return False
 
 
-def send_email_to_multiple(recipients: List[dict], subject: str, message: str, from_email: Optional[str] = None) -> dict:
+def send_email_async(to_email: str, subject: str, message: str, from_email: Optional[str] = None) -> subprocess.Popen:
+    """
+    Start sending an email through Mail and return immediately.
+    
+    The send runs in its own osascript process; a background thread waits for
+    it and prints the AppleScript error if it fails.
+    
+    Args:
+        to_email: The recipient's email address
+        subject: The email subject
+        message: The email body content
+        from_email: Optional sender email address (uses default if not provided)
+        
+    Returns:
+        subprocess.Popen: Handle of the osascript process, for callers that want to wait
+    """
+    return run_applescript_async(
+        SEND_EMAIL_SCRIPT, to_email, subject, message, from_email or "",
+        description=f"sending email to {to_email}"
+    )
+
+
+def send_email_to_multiple(recipients: Iterable[dict], subject: str, message: str, from_email: Optional[str] = None, prefer_smtp: bool = True) -> dict:
     """
     Send the same email to multiple recipients.
     
+    With SMTP configured, messages go over SMTP, one connection per batch of
+    SMTP_BATCH_SIZE recipients with batches sent in parallel as soon as they
+    are read from `recipients`. Otherwise (and for any SMTP failures) all
+    recipients are collected first and sent by a single Mail script run that
+    loops over the addresses and returns one "ok" or "error: ..." line per
+    recipient, in order.
+    
     Args:
-        recipients: List of dictionaries with 'email' and optional 'name' keys
+        recipients: Iterable of dictionaries with 'email' and optional 'name' keys
         subject: The email subject
         message: The email body content
-        from_email: Optional sender email address
+        from_email: Optional sender email address (forces the AppleScript path)
+        prefer_smtp: Try SMTP first when SMTP_EMAIL and SMTP_PASSWORD are set
         
     Returns:
         dict: Results of sending to each recipient
     """
     results = {}
+    # Per-recipient lines are collected and printed in one write at the end
+    report = []
+    if prefer_smtp and not from_email and smtp_configured():
+        print("Sending email over SMTP...")
+        seen = []
+        names = {}
+        
+        def batches():
+            for batch in itertools.batched(recipients, SMTP_BATCH_SIZE):
+                seen.extend(batch)
+                names.update((r['email'], r.get('name', r['email'])) for r in batch)
+                yield [r['email'] for r in batch]
+        
+        def send_batch(batch):
+            return send_email_smtp_bulk(batch, subject, message)
+        
+        try:
+            with ThreadPool(SMTP_CONNECTIONS) as pool:
+                for sent in pool.imap_unordered(send_batch, batches()):
+                    for email, ok in sent.items():
+                        if ok:
+                            results[email] = True
+                            report.append(f"Email sent successfully to {names[email]}")
+        except Exception:
+            # e.g. a JSON error partway through a streamed recipients file:
+            # report what already went out before giving up
+            if report:
+                print('\n'.join(report))
+            raise
+        recipients = [r for r in seen if r['email'] not in results]
+    else:
+        recipients = list(recipients)
     
-    for recipient in recipients:
-        email = recipient['email']
-        name = recipient.get('name', email)
+    if recipients:
+        print(f"Sending email to {len(recipients)} recipients...")
+        try:
+            outcomes = run_applescript(
+                SEND_EMAIL_TO_MULTIPLE_SCRIPT, subject, message, from_email or "",
+                *(r['email'] for r in recipients)
+            ).split('\n')
+        except subprocess.CalledProcessError as e:
+            print(f"Error sending emails: {e}")
+            print(f"AppleScript error: {e.stderr}")
+            outcomes = []
+        except Exception as e:
+            print(f"Unexpected error: {e}")
+            outcomes = []
         
-        print(f"Sending email to {name}...")
-        success = send_email(email, subject, message, from_email)
-        results[email] = success
+        for i, recipient in enumerate(recipients):
+            email = recipient['email']
+            name = recipient.get('name', email)
+            outcome = outcomes[i] if i < len(outcomes) else "error: no result"
+            results[email] = outcome == "ok"
+            if results[email]:
+                report.append(f"Email sent successfully to {name}")
+            else:
+                report.append(f"Error sending email to {name}: {outcome.removeprefix('error: ')}")
+    
+    if report:
+        print('\n'.join(report))
         
     return results
 
 
+@cache_for(5.0)
 def check_mail_app() -> bool:
     """
     Check if Mail app is available.
     
+    The answer is cached for 5 seconds.
+    
     Returns:
         bool: True if Mail app is available, False otherwise
     """
-    try:
-        applescript = '''
-        tell application "System Events"
-            if (name of processes) contains "Mail" then
-                return "running"
-            else
-                return "not running"
-            end if
-        end tell
-        '''
-        
-        result = subprocess.run(
-            ['osascript', '-e', applescript],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        
-        return "running" in result.stdout
-        
-    except Exception:
-        return False
+    return app_running('Mail')
 
 
 def main():
@@ -180,6 +278,12 @@ Examples:
         action='store_true',
         help='Check if Mail app is available'
     )
+    parser.add_argument(
+        '--no-smtp',
+        dest='prefer_smtp',
+        action='store_false',
+        help='Always send through Mail, even if SMTP_EMAIL/SMTP_PASSWORD are set'
+    )
     
     args = parser.parse_args()
     
@@ -200,13 +304,8 @@ Examples:
             
         try:
             with open(args.recipients, 'r') as f:
-                recipients = json.load(f)
-            
-            if not isinstance(recipients, list):
-                print("Error: Recipients file must contain a JSON array")
-                sys.exit(1)
-            
-            results = send_email_to_multiple(recipients, args.subject, args.message, args.from_email)
+                # Over SMTP, batches start sending while the rest of the file is still being read
+                results = send_email_to_multiple(iter_recipients(f), args.subject, args.message, args.from_email, args.prefer_smtp)
             
             # Print summary
             successful = sum(1 for success in results.values() if success)
@@ -225,7 +324,7 @@ Examples:
     
     # Handle single recipient
     elif args.to_email and args.subject and args.message:
-        success = send_email(args.to_email, args.subject, args.message, args.from_email)
+        success = send_email(args.to_email, args.subject, args.message, args.from_email, args.prefer_smtp)
         if not success:
             sys.exit(1)
     
@@ -1,11 +1,18 @@
+import shutil
 import subprocess
 import sys
 
+from send_email_smtp import send_email_smtp_bulk, smtp_configured
+
+# Absolute path, and close_fds=False below, for subprocess's posix_spawn fast
+# path (see the note on OSASCRIPT in applescript.py)
+MUTT = shutil.which('mutt') or 'mutt'
+
 def send_email_with_mutt(recipient, subject, body):
     """
     Sends an email using the 'mutt' command-line client.
 
-    This function constructs and executes a shell command to send an email.
+    This function runs mutt directly and writes the body to its standard input.
     It requires 'mutt' to be installed and configured on the system.
 
     Args:
@@ -17,31 +24,32 @@ def send_email_with_mutt(recipient, subject, body):
         bool: True if the email was sent successfully, False otherwise.
     """
     try:
-        # We use a shell pipeline to pass the body to mutt's standard input.
-        # The `echo` command prints the body, and the `|` (pipe) sends that
-        # output to the `mutt` command.
-        # NOTE: Using shell=True can be a security risk if you don't control
-        # the input. Here we assume the recipient, subject, and body are trusted.
-        command = f'echo "{body}" | mutt -s "{subject}" -- "{recipient}"'
-
-        print(f"Executing command: {command}")
-
-        # subprocess.run executes the command.
-        # - check=True: Raises an exception if the command returns a non-zero exit code (i.e., fails).
-        # - shell=True: Needed to interpret the pipe '|' character.
-        # - capture_output=True: Captures stdout and stderr.
-        # - text=True: Decodes stdout and stderr as text.
-        result = subprocess.run(
+        # mutt reads the body from its standard input. Passing it through a
+        # pipe (rather than `echo "..." | mutt` in a shell) means no extra
+        # sh/echo processes, no shell quoting of the body, and no argv size
+        # limit for long messages.
+        command = [MUTT, '-s', subject, '--', recipient]
+
+        print(f"Executing command: {' '.join(command)}")
+
+        # - stdin=PIPE: communicate() writes the body to mutt and closes stdin.
+        # - stdout/stderr=PIPE: Captures mutt's output for reporting.
+        # - text=True: Encodes the body and decodes the output as text.
+        process = subprocess.Popen(
             command,
-            shell=True,
-            check=True,
-            capture_output=True,
-            text=True
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            close_fds=False
         )
+        stdout, stderr = process.communicate(body)
+        if process.returncode:
+            raise subprocess.CalledProcessError(process.returncode, command, stdout, stderr)
 
         print("Email sent successfully!")
-        if result.stdout:
-            print(f"STDOUT:\n{result.stdout}")
+        if stdout:
+            print(f"STDOUT:\n{stdout}")
         return True
     except FileNotFoundError:
         # This error occurs if the 'mutt' command itself isn't found.
@@ -63,6 +71,32 @@ def send_email_with_mutt(recipient, subject, body):
         print(f"An unexpected error occurred: {e}", file=sys.stderr)
         return False
 
+def send_email_to_multiple_with_mutt(recipients, subject, body):
+    """
+    Sends the same email to several recipients.
+
+    mutt opens a fresh SMTP session for every message it sends. When SMTP is
+    configured (SMTP_EMAIL / SMTP_PASSWORD, see send_email_smtp.py), all the
+    messages go over a single SMTP connection instead, and mutt is only used
+    for the ones that fail there (or for everything if SMTP isn't set up).
+
+    Args:
+        recipients (list[str]): The email addresses of the recipients.
+        subject (str): The subject of the email.
+        body (str): The body content of the email.
+
+    Returns:
+        dict: Maps each recipient to True if its email was sent, False otherwise.
+    """
+    results = dict.fromkeys(recipients, False)
+    if smtp_configured():
+        results.update(send_email_smtp_bulk(list(results), subject, body))
+
+    for recipient, sent in results.items():
+        if not sent:
+            results[recipient] = send_email_with_mutt(recipient, subject, body)
+    return results
+
 # This block runs only when the script is executed directly (e.g., `python send_email.py`)
 if __name__ == "__main__":
     # --- CONFIGURE YOUR TEST EMAIL HERE ---
@@ -11,34 +11,80 @@ Works on macOS, Linux, and Windows. Requires these environment variables:
 import os
 import smtplib
 import logging
+from email.header import Header
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
 
-def send_email_smtp(to_email, subject, message):
-    """Send email via SMTP. Returns True on success, False on failure."""
+def smtp_configured():
+    """True if SMTP_EMAIL and SMTP_PASSWORD are set."""
+    return bool(os.getenv("SMTP_EMAIL") and os.getenv("SMTP_PASSWORD"))
+
+
+def _connect():
+    """Open, secure and log in to the configured SMTP server. Returns (server, sender)."""
     sender = os.getenv("SMTP_EMAIL")
     password = os.getenv("SMTP_PASSWORD")
     host = os.getenv("SMTP_HOST", "smtp.gmail.com")
     port = int(os.getenv("SMTP_PORT", "587"))
 
-    if not sender or not password:
+    server = smtplib.SMTP(host, port)
+    try:
+        server.starttls()
+        server.login(sender, password)
+    except Exception:
+        server.close()
+        raise
+    return server, sender
+
+
+def _build_message(sender, to_email, subject, message):
+    msg = MIMEMultipart()
+    msg["From"] = sender
+    msg["To"] = to_email
+    msg["Subject"] = subject
+    msg.attach(MIMEText(message, "plain"))
+    return msg
+
+
+def send_email_smtp(to_email, subject, message):
+    """Send email via SMTP. Returns True on success, False on failure."""
+    if not smtp_configured():
         logging.warning("SMTP_EMAIL or SMTP_PASSWORD not set — skipping SMTP email")
         return False
 
     try:
-        msg = MIMEMultipart()
-        msg["From"] = sender
-        msg["To"] = to_email
-        msg["Subject"] = subject
-        msg.attach(MIMEText(message, "plain"))
-
-        with smtplib.SMTP(host, port) as server:
-            server.starttls()
-            server.login(sender, password)
-            server.sendmail(sender, to_email, msg.as_string())
+        server, sender = _connect()
+        with server:
+            server.sendmail(sender, to_email, _build_message(sender, to_email, subject, message).as_string())
 
         return True
     except Exception as e:
         logging.error(f"SMTP email failed: {e}")
         return False
+
+
+def send_email_smtp_bulk(to_emails, subject, message):
+    """Send the same email to each address over one SMTP connection. Returns {email: success}."""
+    results = dict.fromkeys(to_emails, False)
+    if not smtp_configured():
+        logging.warning("SMTP_EMAIL or SMTP_PASSWORD not set — skipping SMTP email")
+        return results
+
+    try:
+        server, sender = _connect()
+        # Serialize the message once without a To header, then prepend one per recipient
+        msg = _build_message(sender, "", subject, message)
+        del msg["To"]
+        serialized = msg.as_string()
+        with server:
+            for to_email in results:
+                try:
+                    server.sendmail(sender, to_email, f"To: {Header(to_email).encode()}\n" + serialized)
+                    results[to_email] = True
+                except smtplib.SMTPRecipientsRefused as e:
+                    logging.error(f"SMTP email to {to_email} refused: {e}")
+    except Exception as e:
+        logging.error(f"SMTP email failed: {e}")
+
+    return results
@@ -10,7 +10,52 @@ import subprocess
 import sys
 import argparse
 import json
-from typing import Optional, List
+from typing import Iterable, Optional
+
+from applescript import app_running, cache_for, run_applescript
+from recipients import iter_recipients
+
+# argv is phone number, message and contact name ("" for none)
+SEND_IMESSAGE_SCRIPT = '''
+on run argv
+    set {phoneNumber, theMessage, contactName} to argv
+    tell application "Messages"
+        set targetService to 1st service whose service type = iMessage
+        set targetBuddy to buddy phoneNumber of targetService
+        if contactName is not "" then set targetBuddy's name to contactName
+        send theMessage to targetBuddy
+    end tell
+end run
+'''
+
+# argv is the message, then a phone number and contact name ("" for none) per
+# recipient. Returns one "ok" or "error: ..." line per recipient, in order.
+SEND_IMESSAGE_TO_MULTIPLE_SCRIPT = '''
+on run argv
+    set theMessage to item 1 of argv
+    set outcomes to {}
+    tell application "Messages"
+        set targetService to 1st service whose service type = iMessage
+        repeat with i from 2 to (count of argv) by 2
+            try
+                set targetBuddy to buddy (item i of argv) of targetService
+                set contactName to item (i + 1) of argv
+                if contactName is not "" then set targetBuddy's name to contactName
+                send theMessage to targetBuddy
+                set end of outcomes to "ok"
+            on error errMsg
+                -- One line per recipient, so flatten the message onto a single line
+                set AppleScript's text item delimiters to {linefeed, return}
+                set msgLines to text items of errMsg
+                set AppleScript's text item delimiters to " "
+                set end of outcomes to "error: " & (msgLines as text)
+            end try
+        end repeat
+    end tell
+    set AppleScript's text item delimiters to linefeed
+    return outcomes as text
+end run
+'''
 
 
 def send_imessage(phone_number: str, message: str, contact_name: Optional[str] = None) -> bool:
@@ -25,36 +70,9 @@ def send_imessage(phone_number: str, message: str, contact_name: Optional[str] =
     Returns:
         bool: True if message was sent successfully, False otherwise
     """
-    # Escape special characters in the message for AppleScript
-    escaped_message = message.replace('"', '\\"').replace('\\', '\\\\')
-    
-    # Create the AppleScript command
-    if contact_name:
-        applescript = f'''
-        tell application "Messages"
-            set targetService to 1st service whose service type = iMessage
-            set targetBuddy to buddy "{phone_number}" of targetService
-            set targetBuddy's name to "{contact_name}"
-            send "{escaped_message}" to targetBuddy
-        end tell
-        '''
-    else:
-        applescript = f'''
-        tell application "Messages"
-            set targetService to 1st service whose service type = iMessage
-            set targetBuddy to buddy "{phone_number}" of targetService
-            send "{escaped_message}" to targetBuddy
-        end tell
-        '''
-    
     try:
         # Execute the AppleScript
-        subprocess.run(
-            ['osascript', '-e', applescript],
-            capture_output=True,
-            text=True,
-            check=True
-        )
+        run_applescript(SEND_IMESSAGE_SCRIPT, phone_number, message, contact_name or "")
         print(f"Message sent successfully to {phone_number}")
         return True
         
@@ -67,59 +85,67 @@ def send_imessage(phone_number: str, message: str, contact_name: Optional[str] =
         return False
 
 
-def send_imessage_to_multiple(recipients: List[dict], message: str) -> dict:
+def send_imessage_to_multiple(recipients: Iterable[dict], message: str) -> dict:
     """
     Send the same message to multiple recipients.
     
+    All messages are sent by a single script run: it loops over the recipients
+    and returns one "ok" or "error: ..." line per recipient, in order.
+    
     Args:
-        recipients: List of dictionaries with 'phone_number' and optional 'name' keys
+        recipients: Iterable of dictionaries with 'phone_number' and optional 'name' keys
         message: The message content to send
         
     Returns:
         dict: Results of sending to each recipient
     """
-    results = {}
+    recipients = list(recipients)
+    if not recipients:
+        return {}
     
+    args = []
     for recipient in recipients:
+        args += [recipient['phone_number'], recipient.get('name') or ""]
+    
+    print(f"Sending message to {len(recipients)} recipients...")
+    try:
+        outcomes = run_applescript(SEND_IMESSAGE_TO_MULTIPLE_SCRIPT, message, *args).split('\n')
+    except subprocess.CalledProcessError as e:
+        print(f"Error sending messages: {e}")
+        print(f"AppleScript error: {e.stderr}")
+        outcomes = []
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        outcomes = []
+    
+    results = {}
+    # Per-recipient lines are collected and printed in one write at the end
+    report = []
+    for i, recipient in enumerate(recipients):
         phone_number = recipient['phone_number']
-        contact_name = recipient.get('name')
-        
-        print(f"Sending message to {contact_name or phone_number}...")
-        success = send_imessage(phone_number, message, contact_name)
-        results[phone_number] = success
+        name = recipient.get('name') or phone_number
+        outcome = outcomes[i] if i < len(outcomes) else "error: no result"
+        results[phone_number] = outcome == "ok"
+        if results[phone_number]:
+            report.append(f"Message sent successfully to {name}")
+        else:
+            report.append(f"Error sending message to {name}: {outcome.removeprefix('error: ')}")
+    print('\n'.join(report))
         
     return results
 
 
+@cache_for(5.0)
 def check_messages_app() -> bool:
     """
     Check if Messages app is available and iMessage is configured.
     
+    The answer is cached for 5 seconds.
+    
     Returns:
         bool: True if Messages app is available, False otherwise
     """
-    try:
-        applescript = '''
-        tell application "System Events"
-            if (name of processes) contains "Messages" then
-                return "running"
-            else
-                return "not running"
-            end if
-        end tell
-        '''
-        
-        result = subprocess.run(
-            ['osascript', '-e', applescript],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        
-        return "running" in result.stdout
-        
-    except Exception:
-        return False
+    return app_running('Messages')
 
 
 def main():
@@ -186,13 +212,7 @@ Examples:
             
         try:
             with open(args.recipients, 'r') as f:
-                recipients = json.load(f)
-            
-            if not isinstance(recipients, list):
-                print("Error: Recipients file must contain a JSON array")
-                sys.exit(1)
-            
-            results = send_imessage_to_multiple(recipients, args.message)
+                results = send_imessage_to_multiple(iter_recipients(f), args.message)
             
             # Print summary
             successful = sum(1 for success in results.values() if success)